@@ -0,0 +1,88 @@
+"""Measure cold start: time from `import main` to the first served request.
+
+Each run happens in a fresh interpreter against a throwaway SQLite file, so
+module import, schema bootstrap and the first query are all included.
+
+    python bench_startup.py [runs]
+"""
+import os
+import subprocess
+import sys
+import tempfile
+
+CHILD = r'''
+import asyncio, json, time
+t0 = time.perf_counter()
+import main
+t_import = time.perf_counter()
+
+async def first_request():
+    app = main.app
+    lifespan = asyncio.Queue()
+    await lifespan.put({"type": "lifespan.startup"})
+    sent = []
+    async def lifespan_send(message):
+        sent.append(message)
+        if message["type"] == "lifespan.startup.complete":
+            started.set()
+    started = asyncio.Event()
+    asyncio.create_task(app({"type": "lifespan", "asgi": {"version": "3.0"}}, lifespan.get, lifespan_send))
+    await started.wait()
+    t_startup = time.perf_counter()
+
+    body = []
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+    async def send(message):
+        body.append(message)
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "GET", "scheme": "http", "path": "/getTasks", "raw_path": b"/getTasks",
+        "query_string": b"user_id=bench", "headers": [], "client": ("127.0.0.1", 0),
+        "server": ("127.0.0.1", 8000), "root_path": "",
+    }
+    await app(scope, receive, send)
+    t_request = time.perf_counter()
+    status = body[0]["status"]
+    await main.db.engine.dispose()
+    return t_startup, t_request, status
+
+t_startup, t_request, status = asyncio.run(first_request())
+print(json.dumps({
+    "import": t_import - t0,
+    "startup": t_startup - t_import,
+    "first_request": t_request - t_startup,
+    "total": t_request - t0,
+    "status": status,
+}))
+'''
+
+
+def run_once(db_path: str) -> dict:
+    import json
+    env = dict(os.environ, RUN_TELEGRAM_BOT="0", RUN_ARCHIVER="0", DATABASE_URL=f"sqlite+aiosqlite:///{db_path}")
+    out = subprocess.run(
+        [sys.executable, "-c", CHILD],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=env, capture_output=True, text=True, check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        # The first boot creates and stamps the schema, later ones only check the stamp
+        results = [run_once(db_path) for _ in range(runs)]
+
+    print(f"{'run':>4} {'import':>9} {'startup':>9} {'request':>9} {'total':>9}")
+    for i, r in enumerate(results):
+        print(f"{i:>4} {r['import']*1000:>7.1f}ms {r['startup']*1000:>7.1f}ms "
+              f"{r['first_request']*1000:>7.1f}ms {r['total']*1000:>7.1f}ms")
+    warm = results[1:] or results
+    print(f"mean total (schema already stamped): {sum(r['total'] for r in warm) / len(warm) * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Benchmark concurrent single-task writes with and without group commit.
+
+Fires `writers` concurrent clients at the app over ASGI, each doing `ops`
+/createTask calls followed by an /updateTask on what it created, against a
+throwaway SQLite file. Requests take the same path as in production,
+write slots included; only the per-user rate limit is lifted. Each mode
+runs in a fresh interpreter because main reads its settings at import.
+Reports throughput, latency percentiles and non-2xx responses.
+
+    python bench_writes.py [writers] [ops]
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+CHILD = r'''
+import asyncio, json, sys, time
+import httpx
+import main
+
+writers, ops = int(sys.argv[1]), int(sys.argv[2])
+
+async def client(http, user_id, latencies, errors):
+    for i in range(ops):
+        start = time.perf_counter()
+        response = await http.post("/createTask", params={"user_id": user_id}, json={"title": f"task {i}"})
+        latencies.append(time.perf_counter() - start)
+        if response.status_code != 200:
+            errors.append(response.status_code)
+            continue
+        start = time.perf_counter()
+        response = await http.post("/updateTask", params={"task_id": response.json()["id"], "user_id": user_id},
+                                   json={"completed": True})
+        latencies.append(time.perf_counter() - start)
+        if response.status_code != 200:
+            errors.append(response.status_code)
+
+async def run():
+    # ASGITransport does not run lifespan events
+    await main.db.create_database_tables()
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+        users = [f"bench-{n}" for n in range(writers)]
+        for user_id in users:
+            await http.post("/createUser", params={"user_id": user_id})
+        latencies, errors = [], []
+        start = time.perf_counter()
+        await asyncio.gather(*(client(http, user_id, latencies, errors) for user_id in users))
+        elapsed = time.perf_counter() - start
+    await main.db.close()
+
+    latencies.sort()
+    pick = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000
+    print(json.dumps({
+        "ops/s": len(latencies) / elapsed,
+        "p50 ms": pick(0.50),
+        "p99 ms": pick(0.99),
+        "max ms": latencies[-1] * 1000,
+        "errors": len(errors),
+    }))
+
+asyncio.run(run())
+'''
+
+
+def run(group_commit: bool, writers: int, ops: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(
+            os.environ,
+            DATABASE_URL=f"sqlite+aiosqlite:///{os.path.join(tmp, 'bench.db')}",
+            GROUP_COMMIT="1" if group_commit else "0",
+            RUN_TELEGRAM_BOT="0",
+            RUN_ARCHIVER="0",
+            RATE_LIMIT_PER_SEC="1000000",
+            RATE_LIMIT_BURST="1000000",
+        )
+        out = subprocess.run(
+            [sys.executable, "-c", CHILD, str(writers), str(ops)],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            env=env, capture_output=True, text=True, check=True,
+        )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    writers = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    ops = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    print(f"{writers} concurrent writers x {ops} create+update each")
+    for group_commit in (False, True):
+        result = run(group_commit, writers, ops)
+        label = "group commit" if group_commit else "per-call txn"
+        print(f"{label:>13}: " + "  ".join(
+            f"{k}={v:.1f}" if isinstance(v, float) else f"{k}={v}" for k, v in result.items()
+        ))
+
+
+if __name__ == "__main__":
+    main()
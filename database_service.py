@@ -1,21 +1,147 @@
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker, AsyncEngine
 from sqlalchemy.orm import sessionmaker, selectinload, joinedload
-from sqlalchemy import select, and_, Result
+from sqlalchemy import select, and_, or_, delete, literal, Result, text, event, DateTime
 from contextlib import asynccontextmanager
+import asyncio
 from datetime import datetime, timedelta
 from models import *
 from sqlalchemy.sql.expression import func
 
 class DatabaseService:
-    def __init__(self, db_url: str):
+    def __init__(self, db_url: str, group_commit: bool = False,
+                 group_commit_size: int = 64, group_commit_delay: float = 0.005):
         self.engine: AsyncEngine = create_async_engine(db_url)
         self.AsyncSessionLocal: AsyncSession = async_sessionmaker(
             self.engine, class_=AsyncSession, expire_on_commit=False
         )
+        # With group commit, create_task/update_task are queued and a single
+        # writer applies up to group_commit_size of them per transaction,
+        # waiting at most group_commit_delay seconds to fill a batch
+        self.group_commit = group_commit
+        self.group_commit_size = group_commit_size
+        self.group_commit_delay = group_commit_delay
+        self._write_queue: Optional[asyncio.Queue] = None
+        self._writer: Optional[asyncio.Task] = None
+        self._pending_writes = 0
+        self.write_engine: Optional[AsyncEngine] = None
+        if group_commit:
+            # The writer gets its own engine so the transaction handling below
+            # does not change how every other session locks the database
+            self.write_engine = create_async_engine(db_url)
+            self._enable_savepoints(self.write_engine)
+            self.WriteSessionLocal: AsyncSession = async_sessionmaker(
+                self.write_engine, class_=AsyncSession, expire_on_commit=False
+            )
+
+    @staticmethod
+    def _enable_savepoints(engine: AsyncEngine):
+        # The sqlite3 driver manages BEGIN itself and breaks SAVEPOINT, which the
+        # writer uses to isolate each queued mutation; let SQLAlchemy emit BEGIN.
+        # IMMEDIATE takes the write lock up front, so a batch never fails
+        # upgrading a read lock while another connection is writing
+        @event.listens_for(engine.sync_engine, "connect")
+        def do_connect(dbapi_connection, connection_record):
+            dbapi_connection.isolation_level = None
+
+        @event.listens_for(engine.sync_engine, "begin")
+        def do_begin(conn):
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
 
     async def create_database_tables(self):
+        """Create missing tables unless the database is already stamped with SCHEMA_VERSION"""
         async with self.engine.begin() as conn:
+            # SQLite keeps a free integer in the file header, so the check costs
+            # one pragma instead of reflecting every table on each boot
+            result = await conn.execute(text("PRAGMA user_version"))
+            if result.scalar() == SCHEMA_VERSION:
+                return
+            # Only takes effect on a brand-new file; enable_incremental_vacuum() converts older ones
+            await conn.execute(text("PRAGMA auto_vacuum = INCREMENTAL"))
             await conn.run_sync(Base.metadata.create_all)
+            await conn.execute(text(f"PRAGMA user_version = {int(SCHEMA_VERSION)}"))
+
+    async def close(self):
+        """Flush any queued writes and release the connection pool"""
+        if self._writer is not None:
+            await self._write_queue.put(None)
+            await self._writer
+            self._writer = None
+            self._write_queue = None
+        if self.write_engine is not None:
+            await self.write_engine.dispose()
+        await self.engine.dispose()
+
+    def write_backlog(self) -> int:
+        """Number of queued mutations whose batch has not committed yet"""
+        return self._pending_writes
+
+    async def _submit_write(self, op, *args):
+        if self._writer is None:
+            self._write_queue = asyncio.Queue()
+            self._writer = asyncio.create_task(self._write_loop())
+        future = asyncio.get_running_loop().create_future()
+        self._pending_writes += 1
+        try:
+            await self._write_queue.put((op, args, future))
+            return await future
+        finally:
+            self._pending_writes -= 1
+
+    async def _write_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await self._write_queue.get()
+            if item is None:
+                return
+            batch = [item]
+            stopping = False
+            deadline = loop.time() + self.group_commit_delay
+            while len(batch) < self.group_commit_size:
+                if self._write_queue.empty():
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._write_queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                else:
+                    item = self._write_queue.get_nowait()
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._commit_batch(batch)
+            if stopping:
+                return
+
+    async def _commit_batch(self, batch):
+        outcomes = []
+        try:
+            async with self.WriteSessionLocal() as session:
+                for op, args, future in batch:
+                    if future.done():  # caller went away before we got to it
+                        continue
+                    try:
+                        async with session.begin_nested():
+                            result = await op(session, *args)
+                        outcomes.append((future, result, None))
+                    except Exception as e:
+                        outcomes.append((future, None, e))
+                await session.commit()
+        except Exception as e:
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for future, result, error in outcomes:
+            if future.done():
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
 
     @asynccontextmanager
     async def session(self):
@@ -52,14 +178,30 @@ class DatabaseService:
             
             return user
 
-    async def get_user_tasks(self, user_id: str):
+    async def get_user_tasks(self, user_id: str, include_archived: bool = False):
         async with self.session() as session:
             result: Result = await session.execute(
                 select(TaskModel)
                 .filter(TaskModel.owners.any(UserModel.id == user_id))
                 .order_by(TaskModel.end_datetime, TaskModel.start_datetime)
             )
-            return result.scalars().all()
+            tasks = result.scalars().all()
+            if not include_archived:
+                return tasks
+            
+            archived = await session.execute(
+                select(ArchivedTaskModel)
+                .join(user_task_archive, user_task_archive.c.task_id == ArchivedTaskModel.id)
+                .where(user_task_archive.c.user_id == user_id)
+            )
+            # Match ORDER BY end_datetime, start_datetime above; SQLite sorts NULLs first
+            return sorted(
+                [*archived.scalars().all(), *tasks],
+                key=lambda task: (
+                    task.end_datetime is not None, task.end_datetime or datetime.min,
+                    task.start_datetime is not None, task.start_datetime or datetime.min
+                )
+            )
 
     async def update_user_telegram_id(self, user_id: str, telegram_id: int):
         async with self.session() as session:
@@ -146,24 +288,32 @@ class DatabaseService:
             return task
 
     async def update_task(self, task_id: str, user_id: str, updates: dict) -> TaskModel:
+        if self.group_commit:
+            return await self._submit_write(self._update_task, task_id, user_id, updates)
         async with self.session() as session:
-            result = await session.execute(
-                select(TaskModel).filter(and_(
-                    TaskModel.id == task_id,
-                    TaskModel.owners.any(UserModel.id == user_id)
-                ))
-            )
-            task = result.scalar_one_or_none()
-            
+            task = await self._update_task(session, task_id, user_id, updates)
             if task:
-                for key, value in updates.items():
-                    if hasattr(task, key):
-                        setattr(task, key, value)
                 await session.commit()
                 await session.refresh(task)
-            
             return task
 
+    async def _update_task(self, session: AsyncSession, task_id: str, user_id: str, updates: dict) -> TaskModel:
+        result = await session.execute(
+            select(TaskModel).filter(and_(
+                TaskModel.id == task_id,
+                TaskModel.owners.any(UserModel.id == user_id)
+            ))
+        )
+        task = result.scalar_one_or_none()
+        
+        if task:
+            for key, value in updates.items():
+                if hasattr(task, key):
+                    setattr(task, key, value)
+            await session.flush()
+        
+        return task
+
     async def delete_task(self, task_id: str, user_id: str) -> bool:
         async with self.session() as session:
             result = await session.execute(
@@ -253,36 +403,195 @@ class DatabaseService:
                          description: Optional[str] = None,
                          start_datetime: Optional[datetime] = None, 
                          end_datetime: Optional[datetime] = None) -> TaskModel:
+        args = (user_id, task_id, title, difficulty, description, start_datetime, end_datetime)
+        if self.group_commit:
+            return await self._submit_write(self._create_task, *args)
+        async with self.session() as session:
+            task = await self._create_task(session, *args)
+            await session.commit()
+            await session.refresh(task)
+            return task
+
+    async def _create_task(self, session: AsyncSession, user_id: str, task_id: str, title: str,
+                           difficulty: int, description: Optional[str],
+                           start_datetime: Optional[datetime],
+                           end_datetime: Optional[datetime]) -> TaskModel:
+        user_result = await session.execute(
+            select(UserModel)
+            .options(joinedload(UserModel.tasks))
+            .filter(UserModel.id == user_id)
+        )
+        user = user_result.unique().scalar_one_or_none()
+        
+        if not user:
+            raise ValueError("User not found")
+        
+        task = self._new_task(task_id, title, difficulty, description, start_datetime, end_datetime)
+        user.tasks.append(task)
+        session.add(task)
+        await session.flush()
+        # Drop the loaded owners -> tasks -> owners cycle so the returned object
+        # serialises the same whether or not the caller refreshes it
+        session.expire(task, ["owners"])
+        return task
+
+    async def create_tasks(self, user_id: str, tasks: List[dict]) -> List[TaskModel]:
+        """Insert several tasks for one user in a single transaction.
+
+        Each dict takes the keyword arguments of create_task except user_id.
+        """
         async with self.session() as session:
             user_result = await session.execute(
-                select(UserModel)
-                .options(joinedload(UserModel.tasks))
-                .filter(UserModel.id == user_id)
+                select(UserModel).filter(UserModel.id == user_id)
             )
-            user = user_result.unique().scalar_one_or_none()
+            user = user_result.scalar_one_or_none()
             
             if not user:
                 raise ValueError("User not found")
             
-            # Initialize notifications tracking for all thresholds
-            notifications = {
-                "60": False,  # 1 hour
-                "30": False,  # 30 minutes
-                "10": False   # 10 minutes
-            }
-            
-            task = TaskModel(
-                id=task_id,
-                title=title,
-                description=description,
-                difficulty=difficulty,
-                start_datetime=start_datetime,
-                end_datetime=end_datetime,
-                notifications_sent=notifications
+            created = [
+                self._new_task(
+                    t["task_id"], t["title"], t.get("difficulty"), t.get("description"),
+                    t.get("start_datetime"), t.get("end_datetime")
+                )
+                for t in tasks
+            ]
+            session.add_all(created)
+            # Write the association rows directly instead of loading user.tasks
+            await session.flush()
+            await session.execute(
+                user_task.insert(),
+                [{"user_id": user.id, "task_id": task.id} for task in created]
             )
-            user.tasks.append(task)
-            session.add(task)
-            
             await session.commit()
-            await session.refresh(task)
-            return task
\ No newline at end of file
+            return created
+
+    @staticmethod
+    def _new_task(task_id: str, title: str, difficulty: Optional[int],
+                  description: Optional[str], start_datetime: Optional[datetime],
+                  end_datetime: Optional[datetime]) -> TaskModel:
+        # Initialize notifications tracking for all thresholds
+        notifications = {
+            "60": False,  # 1 hour
+            "30": False,  # 30 minutes
+            "10": False   # 10 minutes
+        }
+        
+        return TaskModel(
+            id=task_id,
+            title=title,
+            description=description,
+            difficulty=difficulty,
+            completed=False,
+            start_datetime=start_datetime,
+            end_datetime=end_datetime,
+            notifications_sent=notifications
+        )
+
+    async def archive_tasks(self, older_than: timedelta, batch_size: int = 100, pause: float = 0.05) -> int:
+        """Move completed or expired tasks that ended before now - older_than into the archive tables.
+
+        Each batch is its own short transaction and the writer lock is released
+        for `pause` seconds between batches. Returns the number of tasks moved.
+        """
+        cutoff = datetime.utcnow() - older_than
+        moved = 0
+        while True:
+            async with self.session() as session:
+                result = await session.execute(
+                    select(TaskModel.id)
+                    .where(self._archivable(cutoff))
+                    .limit(batch_size)
+                )
+                ids = result.scalars().all()
+                if not ids:
+                    return moved
+                moved += await self._archive_batch(session, ids, cutoff)
+                await session.commit()
+            
+            if len(ids) < batch_size:
+                return moved
+            await asyncio.sleep(pause)
+
+    @staticmethod
+    def _archivable(cutoff: datetime):
+        return or_(
+            TaskModel.end_datetime < cutoff,
+            # Completed tasks without a deadline age from their start
+            and_(
+                TaskModel.completed == True,
+                TaskModel.end_datetime.is_(None),
+                TaskModel.start_datetime < cutoff
+            )
+        )
+
+    async def _archive_batch(self, session: AsyncSession, ids: List[str], cutoff: datetime) -> int:
+        # The ids were picked before this transaction took the write lock, so a
+        # task may have been updated since; the copy re-checks the predicate
+        columns = [column.name for column in TaskModel.__table__.columns]
+        await session.execute(
+            ArchivedTaskModel.__table__.insert().from_select(
+                columns + ["archived_at"],
+                select(
+                    *[TaskModel.__table__.c[name] for name in columns],
+                    literal(datetime.utcnow(), DateTime)
+                ).where(TaskModel.id.in_(ids), self._archivable(cutoff))
+            )
+        )
+        # The insert holds the write lock from here on, so the copied rows are
+        # exactly the ones to move
+        result = await session.execute(
+            select(ArchivedTaskModel.id).where(ArchivedTaskModel.id.in_(ids))
+        )
+        archived = result.scalars().all()
+        if not archived:
+            return 0
+        
+        await session.execute(
+            user_task_archive.insert().from_select(
+                ["user_id", "task_id"],
+                select(user_task.c.user_id, user_task.c.task_id)
+                .where(user_task.c.task_id.in_(archived))
+            )
+        )
+        await session.execute(delete(user_task).where(user_task.c.task_id.in_(archived)))
+        await session.execute(delete(TaskModel).where(TaskModel.id.in_(archived)))
+        return len(archived)
+
+    async def compact(self, max_pages: int = 2000, pages_per_step: int = 200) -> int:
+        """Return free pages left behind by archival to the filesystem, a step at a time.
+
+        Does nothing until the file uses incremental auto_vacuum; databases
+        created before that need enable_incremental_vacuum() run once.
+        Returns the number of pages freed.
+        """
+        async with self.engine.connect() as conn:
+            mode = (await conn.execute(text("PRAGMA auto_vacuum"))).scalar()
+            free_pages = (await conn.execute(text("PRAGMA freelist_count"))).scalar()
+        
+        if mode != 2:  # not INCREMENTAL
+            return 0
+        
+        target = min(free_pages, max_pages)
+        freed = 0
+        while freed < target:
+            step = min(pages_per_step, target - freed)
+            async with self.engine.begin() as conn:
+                # The driver steps a pragma only once and each step frees one page
+                for _ in range(step):
+                    await conn.execute(text("PRAGMA incremental_vacuum"))
+            freed += step
+            await asyncio.sleep(0)
+        return freed
+
+    async def enable_incremental_vacuum(self):
+        """Switch an existing database to incremental auto_vacuum.
+
+        Rewrites the whole file with VACUUM and holds an exclusive lock while
+        doing so, so run it as a maintenance step rather than from the app.
+        """
+        async with self.engine.connect() as conn:
+            conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+            # The setting only sticks when VACUUM runs on the same connection
+            await conn.execute(text("PRAGMA auto_vacuum = INCREMENTAL"))
+            await conn.execute(text("VACUUM"))
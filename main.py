@@ -1,18 +1,18 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from typing import List, Optional
+from fastapi.responses import JSONResponse, StreamingResponse
+from typing import List, Optional, AsyncIterator, Callable
+from contextlib import nullcontext
 from pydantic import BaseModel
 from datetime import datetime, timedelta
 import uuid
 from database_service import DatabaseService
+from rate_limiter import RateLimiter, RateLimitExceeded, RequestTooLarge
+from task_stream import TaskStreamParser
 import asyncio
-from telegram_bot import TelegramBot
-from keys import *
 import json
-from openai import OpenAI
+import logging
 import os
-from pydantic import BaseModel
-from keys import OPENAI_KEY
 from models import *
 
 
@@ -51,25 +51,99 @@ class TaskResponse(TaskBase):
     class Config:
         from_attributes = True
 
-db = DatabaseService("sqlite+aiosqlite:///./todo.db")
+db = DatabaseService(
+    os.environ.get("DATABASE_URL", "sqlite+aiosqlite:///./todo.db"),
+    group_commit=os.environ.get("GROUP_COMMIT", "0") == "1"
+)
+
+# Heavy subsystems are created on first use so importing this module stays cheap.
+# Set RUN_TELEGRAM_BOT=0 in every process except the one that should poll Telegram.
+bot = None
+_openai_client = None
+_async_openai_client = None
+
+limiter = RateLimiter.from_env()
+
+@app.exception_handler(RateLimitExceeded)
+async def rate_limit_handler(request: Request, exc: RateLimitExceeded):
+    return JSONResponse(
+        status_code=429,
+        content={"detail": exc.detail},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
 
-# Initialize bot with your token
-bot = TelegramBot(TG_KEY, db)
+@app.exception_handler(RequestTooLarge)
+async def request_too_large_handler(request: Request, exc: RequestTooLarge):
+    # No Retry-After: repeating the same request can never succeed
+    return JSONResponse(status_code=413, content={"detail": exc.detail})
+
+def queued_write_slot():
+    # With group commit the single writer already serialises create_task and
+    # update_task; holding a slot per request would cap every batch at
+    # WRITE_CONCURRENCY mutations, so only shed once the queue is too deep
+    if db.group_commit:
+        limiter.check_backlog(db.write_backlog())
+        return nullcontext()
+    return limiter.write_slot()
+
+def get_openai_client():
+    global _openai_client
+    if _openai_client is None:
+        from openai import OpenAI
+        from keys import OPENAI_KEY
+        _openai_client = OpenAI(api_key=OPENAI_KEY)
+    return _openai_client
+
+def get_async_openai_client():
+    global _async_openai_client
+    if _async_openai_client is None:
+        from openai import AsyncOpenAI
+        from keys import OPENAI_KEY
+        _async_openai_client = AsyncOpenAI(api_key=OPENAI_KEY)
+    return _async_openai_client
 
 @app.on_event("startup")
 async def startup():
+    global bot
     await db.create_database_tables()
-    asyncio.create_task(bot.start())
+    if os.environ.get("RUN_TELEGRAM_BOT", "1") == "1":
+        from telegram_bot import TelegramBot
+        from keys import TG_KEY
+        bot = TelegramBot(TG_KEY, db)
+        asyncio.create_task(bot.start())
+    # Opt in (RUN_ARCHIVER=1) in exactly one process, like the bot
+    if os.environ.get("RUN_ARCHIVER", "0") == "1":
+        asyncio.create_task(archive_old_tasks())
+
+async def archive_old_tasks():
+    """Periodically move finished tasks to the archive tables and reclaim the space"""
+    older_than = timedelta(days=float(os.environ.get("ARCHIVE_AFTER_DAYS", 30)))
+    batch_size = int(os.environ.get("ARCHIVE_BATCH_SIZE", 100))
+    while True:
+        try:
+            moved = await db.archive_tasks(older_than, batch_size=batch_size)
+            if moved:
+                await db.compact()
+        except Exception as e:
+            logging.error(f"Error in task archiver: {e}")
+        
+        await asyncio.sleep(float(os.environ.get("ARCHIVE_INTERVAL", 3600)))
+
+@app.on_event("shutdown")
+async def shutdown():
+    await db.close()
 
 @app.get("/getTasks")
-async def get_tasks(user_id: str):
-    tasks = await db.get_user_tasks(user_id)
+async def get_tasks(user_id: str, include_archived: bool = False):
+    limiter.check("getTasks", user_id)
+    tasks = await db.get_user_tasks(user_id, include_archived=include_archived)
     if tasks is None:
         return []
     return tasks
 
 @app.get("/getTask")
 async def get_task(task_id: str, user_id: str):
+    limiter.check("getTask", user_id)
     task = await db.get_user_task(task_id, user_id)
     if task is None:
         raise HTTPException(status_code=404, detail="Task not found")
@@ -77,48 +151,58 @@ async def get_task(task_id: str, user_id: str):
 
 @app.post("/createTask")
 async def create_task(task: TaskCreate, user_id: str):
+    limiter.check("createTask", user_id)
     try:
         task_id = str(uuid.uuid4())
-        new_task = await db.create_task(
-            user_id=user_id,
-            task_id=task_id,
-            title=task.title,
-            difficulty=task.difficulty,
-            description=task.description,
-            start_datetime=task.start_datetime,
-            end_datetime=task.end_datetime
-        )
+        async with queued_write_slot():
+            new_task = await db.create_task(
+                user_id=user_id,
+                task_id=task_id,
+                title=task.title,
+                difficulty=task.difficulty,
+                description=task.description,
+                start_datetime=task.start_datetime,
+                end_datetime=task.end_datetime
+            )
         return new_task
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @app.post("/updateTask")
 async def update_task(task_id: str, task: TaskUpdate, user_id: str):
+    limiter.check("updateTask", user_id)
     updates = task.dict(exclude_unset=True)
-    updated_task = await db.update_task(task_id, user_id, updates)
+    async with queued_write_slot():
+        updated_task = await db.update_task(task_id, user_id, updates)
     if updated_task is None:
         raise HTTPException(status_code=404, detail="Task not found")
     return updated_task
 
 @app.post("/deleteTask")
 async def delete_task(task_id: str, user_id: str):
-    success = await db.delete_task(task_id, user_id)
+    limiter.check("deleteTask", user_id)
+    async with limiter.write_slot():
+        success = await db.delete_task(task_id, user_id)
     if not success:
         raise HTTPException(status_code=404, detail="Task not found")
     return {"message": "Task deleted successfully"}
 
 @app.post("/shareTask")
 async def share_task(task_id: str, shared_user_id: str):
+    limiter.check("shareTask", shared_user_id)
     try:
-        await db.share_task(shared_user_id, task_id)
+        async with limiter.write_slot():
+            await db.share_task(shared_user_id, task_id)
         return {"message": "Task shared successfully"}
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
 
 @app.post("/createUser")
 async def create_user(user_id: str):
+    limiter.check("createUser", user_id)
     try:
-        user = await db.create_user(user_id)
+        async with limiter.write_slot():
+            user = await db.create_user(user_id)
         return {"message": "User created successfully", "user": user}
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -140,41 +224,40 @@ class GenerateTasksRequest(BaseModel):
 @app.post("/generateTasks")
 async def generate_tasks(request: GenerateTasksRequest):
     """Generate and create project tasks from a prompt"""
+    limiter.check("generateTasks", request.user_id)
     try:
         tasks: BreakDown = await generate_project_tasks(request.prompt)
         
         # Create all tasks for user
-        created_tasks = []
+        new_tasks = []
         current_time = datetime.utcnow()
-        
         for task in tasks.tasks:
-            task_id = str(uuid.uuid4())
-            db_task = await db.create_task(
-                user_id=request.user_id,
-                task_id=task_id,
-                title=task.title,
-                description=task.description,
-                start_datetime=current_time,
-                end_datetime=current_time + timedelta(hours=task.estimated_hours)
-            )
-            created_tasks.append(db_task)
+            new_tasks.append({
+                "task_id": str(uuid.uuid4()),
+                "title": task.title,
+                "description": task.description,
+                "start_datetime": current_time,
+                "end_datetime": current_time + timedelta(hours=task.estimated_hours)
+            })
             current_time = current_time + timedelta(hours=task.estimated_hours)
+        
+        # Only the insert holds a write slot, not the completion call. All
+        # tasks go in one transaction rather than through the group-commit queue
+        async with limiter.write_slot():
+            created_tasks = await db.create_tasks(request.user_id, new_tasks)
             
         return created_tasks
+    except RateLimitExceeded:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 async def generate_project_tasks(prompt: str):
     """Generate project tasks using OpenAI"""
-    client = OpenAI(api_key=OPENAI_KEY)
+    client = get_openai_client()
     response = client.beta.chat.completions.parse(
         model="gpt-4o",
-        messages=[
-            {"role": "system", "content": """Break down the project into specific, actionable tasks. 
-             For each task include a clear title, detailed description, and realistic time estimate.
-             Tasks should be sequential and cover the complete project lifecycle."""},
-            {"role": "user", "content": f"Create a task list for this project: {prompt}"}
-        ],
+        messages=breakdown_messages(prompt),
         response_format=BreakDown,
     )
 
@@ -182,6 +265,119 @@ async def generate_project_tasks(prompt: str):
         response.choices[0].message.parsed
     )["tasks"]
 
+def breakdown_messages(prompt: str) -> list:
+    return [
+        {"role": "system", "content": """Break down the project into specific, actionable tasks. 
+         For each task include a clear title, detailed description, and realistic time estimate.
+         Tasks should be sequential and cover the complete project lifecycle."""},
+        {"role": "user", "content": f"Create a task list for this project: {prompt}"}
+    ]
+
+async def stream_project_tasks(prompt: str) -> AsyncIterator[str]:
+    """Yield the raw JSON text of the task breakdown as OpenAI produces it"""
+    client = get_async_openai_client()
+    async with client.beta.chat.completions.stream(
+        model="gpt-4o",
+        messages=breakdown_messages(prompt),
+        response_format=BreakDown,
+    ) as stream:
+        async for event in stream:
+            if event.type == "content.delta":
+                yield event.delta
+
+def get_completion_stream() -> Callable[[str], AsyncIterator[str]]:
+    # Override in tests, e.g. with task_stream.canned_completion(text), to run without OpenAI
+    return stream_project_tasks
+
+# Generated tasks are inserted once this many are waiting or the oldest has
+# waited this long, whichever comes first
+STREAM_BATCH_SIZE = 3
+STREAM_BATCH_DELAY = 0.5
+
+@app.post("/generateTasksStream")
+async def generate_tasks_stream(request: GenerateTasksRequest,
+                                completion_stream: Callable[[str], AsyncIterator[str]] = Depends(get_completion_stream)):
+    """Generate tasks from a prompt, streaming each created task as an NDJSON line"""
+    limiter.check("generateTasks", request.user_id)
+    # Fail before the 200 goes out; once streaming starts errors can only be reported in-band
+    if await db.get_user(request.user_id) is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return StreamingResponse(
+        stream_created_tasks(request, completion_stream),
+        media_type="application/x-ndjson"
+    )
+
+async def stream_created_tasks(request: GenerateTasksRequest,
+                               completion_stream: Callable[[str], AsyncIterator[str]]) -> AsyncIterator[str]:
+    loop = asyncio.get_running_loop()
+    parser = TaskStreamParser()
+    current_time = datetime.utcnow()
+    pending = []
+    oldest = None
+
+    async def flush():
+        async with limiter.write_slot():
+            created = await db.create_tasks(request.user_id, pending)
+        pending.clear()
+        return [TaskResponse.model_validate(task).model_dump_json() + "\n" for task in created]
+
+    error = None
+    chunks = completion_stream(request.prompt).__aiter__()
+    next_chunk = None
+    try:
+        while True:
+            if next_chunk is None:
+                next_chunk = asyncio.ensure_future(chunks.__anext__())
+            # Wait no longer than the oldest pending task may sit unsaved.
+            # asyncio.wait leaves next_chunk running on timeout, whereas
+            # wait_for would cancel it and break the completion stream
+            timeout = None if oldest is None else max(0.0, oldest + STREAM_BATCH_DELAY - loop.time())
+            done, _ = await asyncio.wait({next_chunk}, timeout=timeout)
+            if not done:
+                for line in await flush():
+                    yield line
+                oldest = None
+                continue
+            try:
+                chunk = next_chunk.result()
+            except StopAsyncIteration:
+                break
+            finally:
+                next_chunk = None
+            for item in parser.feed(chunk):
+                task = GeneratedTask.model_validate(item)
+                # Chain each task after the previous one as it arrives
+                end_time = current_time + timedelta(hours=task.estimated_hours)
+                pending.append({
+                    "task_id": str(uuid.uuid4()),
+                    "title": task.title,
+                    "description": task.description,
+                    "start_datetime": current_time,
+                    "end_datetime": end_time,
+                })
+                current_time = end_time
+                if oldest is None:
+                    oldest = loop.time()
+            if pending and (len(pending) >= STREAM_BATCH_SIZE or loop.time() - oldest >= STREAM_BATCH_DELAY):
+                for line in await flush():
+                    yield line
+                oldest = None
+    except Exception as e:
+        error = e
+    finally:
+        # Only set when we stop early, e.g. the client disconnected
+        if next_chunk is not None:
+            next_chunk.cancel()
+    # Keep whatever the model produced before a failure
+    if pending:
+        try:
+            for line in await flush():
+                yield line
+        except Exception as e:
+            error = error or e
+    if error is not None:
+        yield json.dumps({"error": getattr(error, "detail", None) or str(error)}) + "\n"
+
 
 class BulkTaskCreate(BaseModel):
     tasks: List[TaskCreate]
@@ -190,21 +386,25 @@ class BulkTaskCreate(BaseModel):
 @app.post("/bulkCreateTasks")
 async def bulk_create_tasks(task_create: BulkTaskCreate):
     """Create multiple tasks at once with automatic scheduling"""
+    limiter.check("bulkCreateTasks", task_create.user_id, units=len(task_create.tasks))
     try:
-        resp = []
-        for task in task_create.tasks:
-            task_id = str(uuid.uuid4())
-            new_task = await db.create_task(
-                user_id=task_create.user_id,
-                task_id=task_id,
-                title=task.title,
-                difficulty=task.difficulty,
-                description=task.description,
-                start_datetime=task.start_datetime,
-                end_datetime=task.end_datetime
-            )
-            resp.append(new_task)
+        new_tasks = [
+            {
+                "task_id": str(uuid.uuid4()),
+                "title": task.title,
+                "difficulty": task.difficulty,
+                "description": task.description,
+                "start_datetime": task.start_datetime,
+                "end_datetime": task.end_datetime
+            }
+            for task in task_create.tasks
+        ]
+        # One transaction for the whole batch rather than one per task
+        async with limiter.write_slot():
+            resp = await db.create_tasks(task_create.user_id, new_tasks)
         return resp
+    except RateLimitExceeded:
+        raise
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
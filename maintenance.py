@@ -0,0 +1,33 @@
+"""Offline maintenance for the task database.
+
+    python maintenance.py enable-incremental-vacuum [database_url]
+
+Converts a database created before incremental auto_vacuum to use it, so
+the archiver's compaction step can reclaim space. This runs a full VACUUM
+that locks the file until it finishes; stop the app first.
+"""
+import asyncio
+import sys
+
+from database_service import DatabaseService
+
+
+async def enable_incremental_vacuum(db_url: str):
+    db = DatabaseService(db_url)
+    await db.create_database_tables()
+    await db.enable_incremental_vacuum()
+    await db.close()
+    print(f"{db_url}: auto_vacuum set to INCREMENTAL")
+
+
+COMMANDS = {
+    "enable-incremental-vacuum": enable_incremental_vacuum,
+}
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in COMMANDS:
+        print(__doc__)
+        sys.exit(1)
+    db_url = sys.argv[2] if len(sys.argv) > 2 else "sqlite+aiosqlite:///./todo.db"
+    asyncio.run(COMMANDS[sys.argv[1]](db_url))
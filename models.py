@@ -5,6 +5,9 @@ from datetime import datetime
 from pydantic import BaseModel
 from typing import Optional, List
 
+# Bump whenever the tables below change so startup re-runs create_all
+SCHEMA_VERSION = 2
+
 class Base(AsyncAttrs, DeclarativeBase):
     pass
 
@@ -36,4 +39,24 @@ class TaskModel(Base):
     end_datetime = Column(DateTime, nullable=True)
     notifications_sent = Column(JSON, default=dict)  # Track notifications: {"60": true, "30": true, "10": false}
     owners = relationship("UserModel", secondary=user_task, back_populates="tasks")
-    
\ No newline at end of file
+
+# Cold storage for finished tasks, moved here by DatabaseService.archive_tasks
+user_task_archive = Table(
+    'user_task_archive',
+    Base.metadata,
+    Column('user_id', String, index=True),
+    Column('task_id', String, ForeignKey('tasks_archive.id'))
+)
+
+class ArchivedTaskModel(Base):
+    __tablename__ = "tasks_archive"
+
+    id = Column(String, primary_key=True, index=True)
+    title = Column(String, nullable=False)
+    description = Column(String, nullable=True)
+    difficulty = Column(Integer, nullable=True)
+    completed = Column(Boolean, default=False)
+    start_datetime = Column(DateTime, nullable=True)
+    end_datetime = Column(DateTime, nullable=True)
+    notifications_sent = Column(JSON, default=dict)
+    archived_at = Column(DateTime, nullable=False)
@@ -1,7 +1,5 @@
-from openai import OpenAI
 import os
 from pydantic import BaseModel
-from keys import OPENAI_KEY
 
 class CalendarEvent(BaseModel):
     name: str
@@ -10,7 +8,16 @@ class CalendarEvent(BaseModel):
 
 class OpenAIService:
     def __init__(self):
-        self.client = OpenAI(api_key=OPENAI_KEY)
+        self._client = None
+
+    @property
+    def client(self):
+        # Importing the SDK is slow, so defer it until the first completion
+        if self._client is None:
+            from openai import OpenAI
+            from keys import OPENAI_KEY
+            self._client = OpenAI(api_key=OPENAI_KEY)
+        return self._client
 
     
     async def get_completion_structured(self, prompt: str) -> CalendarEvent:
@@ -0,0 +1,127 @@
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+
+
+class RateLimitExceeded(Exception):
+    def __init__(self, retry_after: float, detail: str = "Too many requests"):
+        super().__init__(detail)
+        self.detail = detail
+        # Retry-After only accepts whole seconds
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class RequestTooLarge(Exception):
+    """A single request costs more than a full bucket and can never be admitted"""
+
+    def __init__(self, cost: float, limit: float):
+        self.detail = f"Request costs {cost:g} units, the limit per request is {limit:g}"
+        super().__init__(self.detail)
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self, cost: float) -> float:
+        """Consume `cost` tokens, or return how many seconds until that would succeed"""
+        self.refill(time.monotonic())
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0.0
+        return (cost - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """Per-user token buckets plus a global cap on concurrent writes.
+
+    Every endpoint spends `costs[endpoint] * units` tokens from the caller's
+    bucket; a request costing more than a full bucket is rejected outright
+    with RequestTooLarge. Only the `max_buckets` most recently used buckets
+    are kept. Write endpoints additionally hold a slot for the duration of
+    the database work; once `max_queued_writes` requests are already
+    waiting for a slot, new ones are rejected immediately instead of
+    queueing behind SQLite's writer lock.
+    """
+
+    DEFAULT_COSTS = {
+        "generateTasks": 20,
+        "bulkCreateTasks": 1,  # per task in the batch
+    }
+
+    def __init__(self, rate: float = 5.0, burst: float = 30.0,
+                 costs: Optional[Dict[str, float]] = None,
+                 write_concurrency: int = 4, max_queued_writes: int = 32,
+                 max_buckets: int = 10000):
+        self.rate = rate
+        self.burst = burst
+        self.costs = {**self.DEFAULT_COSTS, **(costs or {})}
+        self.max_buckets = max_buckets
+        self.buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self.write_semaphore = asyncio.Semaphore(write_concurrency)
+        self.max_queued_writes = max_queued_writes
+        self.queued_writes = 0
+
+    @classmethod
+    def from_env(cls) -> "RateLimiter":
+        costs = {}
+        # e.g. RATE_LIMIT_COSTS="generateTasks=20,createTask=1"
+        for item in os.environ.get("RATE_LIMIT_COSTS", "").split(","):
+            if "=" in item:
+                name, cost = item.split("=", 1)
+                costs[name.strip()] = float(cost)
+        return cls(
+            rate=float(os.environ.get("RATE_LIMIT_PER_SEC", 5.0)),
+            burst=float(os.environ.get("RATE_LIMIT_BURST", 30.0)),
+            costs=costs,
+            write_concurrency=int(os.environ.get("WRITE_CONCURRENCY", 4)),
+            max_queued_writes=int(os.environ.get("WRITE_QUEUE_LIMIT", 32)),
+        )
+
+    def check(self, endpoint: str, user_id: str, units: int = 1):
+        """Charge the user's bucket for a call, raising RateLimitExceeded when it is empty"""
+        cost = self.costs.get(endpoint, 1) * max(units, 1)
+        if cost > self.burst:
+            raise RequestTooLarge(cost, self.burst)
+        bucket = self.buckets.get(user_id)
+        if bucket is None:
+            # user_id comes from the client, so evict the least recently used
+            # bucket instead of letting the table grow
+            if len(self.buckets) >= self.max_buckets:
+                self.buckets.popitem(last=False)
+            bucket = self.buckets[user_id] = TokenBucket(self.rate, self.burst)
+        else:
+            self.buckets.move_to_end(user_id)
+        wait = bucket.take(cost)
+        if wait:
+            raise RateLimitExceeded(wait)
+
+    def check_backlog(self, backlog: int):
+        """Shed a write when `backlog` writes are already queued elsewhere, e.g. for group commit"""
+        if backlog >= self.max_queued_writes:
+            raise RateLimitExceeded(1, "Server is busy, retry shortly")
+
+    @asynccontextmanager
+    async def write_slot(self):
+        if self.write_semaphore.locked() and self.queued_writes >= self.max_queued_writes:
+            raise RateLimitExceeded(1, "Server is busy, retry shortly")
+        self.queued_writes += 1
+        try:
+            await self.write_semaphore.acquire()
+        finally:
+            self.queued_writes -= 1
+        try:
+            yield
+        finally:
+            self.write_semaphore.release()
@@ -0,0 +1,63 @@
+import asyncio
+import json
+from typing import AsyncIterator, Callable, List
+
+
+class TaskStreamParser:
+    """Pull complete task objects out of a JSON completion as it streams in.
+
+    The model answers with `{"tasks": [{...}, {...}]}`; every object that
+    opens at `item_depth` (inside the top-level object and the tasks array)
+    is decoded and returned by `feed` as soon as its closing brace arrives.
+    """
+
+    def __init__(self, item_depth: int = 2):
+        self.item_depth = item_depth
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.capturing = False
+        self.buffer: List[str] = []
+
+    def feed(self, chunk: str) -> List[dict]:
+        items = []
+        for ch in chunk:
+            if self.capturing:
+                self.buffer.append(ch)
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif ch == "\\":
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+                continue
+            if ch == '"':
+                self.in_string = True
+            elif ch in "{[":
+                if ch == "{" and self.depth == self.item_depth and not self.capturing:
+                    self.capturing = True
+                    self.buffer = [ch]
+                self.depth += 1
+            elif ch in "}]":
+                self.depth -= 1
+                if self.capturing and self.depth == self.item_depth:
+                    items.append(json.loads("".join(self.buffer)))
+                    self.capturing = False
+                    self.buffer = []
+        return items
+
+
+async def canned_chunks(text: str, chunk_size: int = 16, delay: float = 0.0) -> AsyncIterator[str]:
+    """Replay a fixed completion in small pieces, standing in for the OpenAI stream"""
+    for i in range(0, len(text), chunk_size):
+        if delay:
+            await asyncio.sleep(delay)
+        yield text[i:i + chunk_size]
+
+
+def canned_completion(text: str, chunk_size: int = 16, delay: float = 0.0) -> Callable[[str], AsyncIterator[str]]:
+    """Build a completion source that ignores the prompt and replays `text`"""
+    def stream(prompt: str) -> AsyncIterator[str]:
+        return canned_chunks(text, chunk_size, delay)
+    return stream
@@ -0,0 +1,31 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from fastapi.testclient import TestClient
+
+
+@pytest.fixture
+def make_client(tmp_path, monkeypatch):
+    """Import main against a throwaway database; main reads its settings at import time"""
+    clients = []
+
+    def make(**env):
+        monkeypatch.setenv("DATABASE_URL", f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+        monkeypatch.setenv("RUN_TELEGRAM_BOT", "0")
+        monkeypatch.setenv("RUN_ARCHIVER", "0")
+        for key, value in env.items():
+            monkeypatch.setenv(key, value)
+        sys.modules.pop("main", None)
+        import main
+        client = TestClient(main.app)
+        client.__enter__()
+        clients.append(client)
+        return main, client
+
+    yield make
+    for client in clients:
+        client.__exit__(None, None, None)
+    sys.modules.pop("main", None)
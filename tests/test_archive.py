@@ -0,0 +1,135 @@
+import asyncio
+import sqlite3
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+from database_service import DatabaseService
+
+
+async def add_task(db, title, completed=False, start=None, end=None):
+    task = await db.create_task(user_id="alice", task_id=str(uuid.uuid4()), title=title,
+                                difficulty=1, start_datetime=start, end_datetime=end)
+    if completed:
+        await db.update_task(task.id, "alice", {"completed": True})
+    return task
+
+
+async def pragma(db, name):
+    async with db.engine.connect() as conn:
+        return (await conn.execute(text(f"PRAGMA {name}"))).scalar()
+
+
+def test_archive_moves_finished_tasks_in_batches(tmp_path):
+    async def scenario():
+        db = DatabaseService(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+        await db.create_database_tables()
+        await db.create_user("alice")
+        now = datetime.utcnow()
+        await add_task(db, "done long ago", completed=True, start=now - timedelta(days=41), end=now - timedelta(days=40))
+        await add_task(db, "expired", end=now - timedelta(days=35))
+        await add_task(db, "done, no deadline", completed=True, start=now - timedelta(days=60))
+        await add_task(db, "recently expired", end=now - timedelta(days=2))
+        await add_task(db, "upcoming", start=now, end=now + timedelta(days=1))
+        await add_task(db, "no dates")
+
+        moved = await db.archive_tasks(timedelta(days=30), batch_size=2, pause=0)
+        assert moved == 3
+
+        hot = [task.title for task in await db.get_user_tasks("alice")]
+        assert hot == ["no dates", "recently expired", "upcoming"]
+        everything = [task.title for task in await db.get_user_tasks("alice", include_archived=True)]
+        # NULL end dates sort first, then by end, matching the hot query
+        assert everything == [
+            "no dates", "done, no deadline", "done long ago", "expired", "recently expired", "upcoming"
+        ]
+
+        assert await db.archive_tasks(timedelta(days=30)) == 0
+        await db.close()
+
+    asyncio.run(scenario())
+
+
+def test_compact_waits_for_explicit_conversion(tmp_path):
+    path = tmp_path / "old.db"
+    # A database created before incremental auto_vacuum existed
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE filler (x)")
+    conn.executemany("INSERT INTO filler VALUES (?)", [("x" * 1000,)] * 2000)
+    conn.commit()
+    conn.execute("DELETE FROM filler")
+    conn.commit()
+    conn.close()
+
+    async def scenario():
+        db = DatabaseService(f"sqlite+aiosqlite:///{path}")
+        await db.create_database_tables()
+        assert await pragma(db, "auto_vacuum") == 0
+        assert await db.compact() == 0
+        assert await pragma(db, "freelist_count") > 0
+
+        await db.enable_incremental_vacuum()
+        assert await pragma(db, "auto_vacuum") == 2
+        await db.close()
+
+    asyncio.run(scenario())
+
+
+def test_compact_frees_pages_incrementally(tmp_path):
+    async def scenario():
+        db = DatabaseService(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+        await db.create_database_tables()
+        assert await pragma(db, "auto_vacuum") == 2
+        await db.create_user("alice")
+        old = datetime.utcnow() - timedelta(days=90)
+        for i in range(200):
+            await add_task(db, "x" * 2000, end=old)
+        await db.archive_tasks(timedelta(days=30))
+        async with db.engine.begin() as conn:
+            await conn.execute(text("DELETE FROM tasks_archive"))
+
+        free = await pragma(db, "freelist_count")
+        assert free > 10
+        assert await db.compact(max_pages=10, pages_per_step=4) == 10
+        assert await pragma(db, "freelist_count") == free - 10
+        await db.close()
+
+    asyncio.run(scenario())
+
+
+def test_get_tasks_reads_archive_only_when_asked(make_client):
+    main, client = make_client()
+    client.post("/createUser", params={"user_id": "alice"})
+    client.post("/createTask", params={"user_id": "alice"}, json={
+        "title": "old", "end_datetime": (datetime.utcnow() - timedelta(days=90)).isoformat()
+    })
+    client.post("/createTask", params={"user_id": "alice"}, json={"title": "new"})
+    assert client.portal.call(main.db.archive_tasks, timedelta(days=30)) == 1
+
+    titles = lambda **params: [t["title"] for t in client.get("/getTasks", params={"user_id": "alice", **params}).json()]
+    assert titles() == ["new"]
+    assert titles(include_archived="true") == ["new", "old"]
+
+
+def test_archive_rechecks_tasks_updated_after_selection(tmp_path):
+    async def scenario():
+        db = DatabaseService(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+        await db.create_database_tables()
+        await db.create_user("alice")
+        now = datetime.utcnow()
+        cutoff = now - timedelta(days=30)
+        stale = await add_task(db, "stale", end=now - timedelta(days=40))
+        extended = await add_task(db, "extended", end=now - timedelta(days=40))
+
+        # Both were archivable when selected; one deadline moves before the move runs
+        await db.update_task(extended.id, "alice", {"end_datetime": now + timedelta(days=1)})
+        async with db.session() as session:
+            assert await db._archive_batch(session, [stale.id, extended.id], cutoff) == 1
+
+        assert [task.title for task in await db.get_user_tasks("alice")] == ["extended"]
+        titles = [task.title for task in await db.get_user_tasks("alice", include_archived=True)]
+        assert titles == ["stale", "extended"]
+        await db.close()
+
+    asyncio.run(scenario())
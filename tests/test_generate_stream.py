@@ -0,0 +1,107 @@
+import json
+from datetime import datetime, timedelta
+
+from task_stream import canned_chunks, canned_completion
+
+TASKS = [
+    {"title": f"step {i}", "description": f"do part {i}", "estimated_hours": hours}
+    for i, hours in enumerate([1, 2.5, 0.5, 3, 1, 2, 4])
+]
+
+
+def stream(client, main, completion):
+    main.app.dependency_overrides[main.get_completion_stream] = lambda: completion
+    response = client.post("/generateTasksStream", json={"prompt": "ship it", "user_id": "alice"})
+    assert response.status_code == 200, response.text
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def test_streams_created_tasks_in_micro_batches(make_client):
+    main, client = make_client()
+    client.post("/createUser", params={"user_id": "alice"})
+
+    batches = []
+    create_tasks = main.db.create_tasks
+
+    async def recording_create_tasks(user_id, tasks):
+        batches.append(len(tasks))
+        return await create_tasks(user_id, tasks)
+
+    main.db.create_tasks = recording_create_tasks
+    lines = stream(client, main, canned_completion(json.dumps({"tasks": TASKS}), chunk_size=8))
+
+    assert [line["title"] for line in lines] == [task["title"] for task in TASKS]
+    assert sum(batches) == len(TASKS)
+    assert len(batches) > 1 and max(batches) <= main.STREAM_BATCH_SIZE
+
+    # Each task starts when the previous one ends
+    for previous, line, task in zip([None] + lines, lines, TASKS):
+        start = datetime.fromisoformat(line["start_datetime"])
+        end = datetime.fromisoformat(line["end_datetime"])
+        assert end - start == timedelta(hours=task["estimated_hours"])
+        if previous is not None:
+            assert start == datetime.fromisoformat(previous["end_datetime"])
+
+    stored = client.get("/getTasks", params={"user_id": "alice"}).json()
+    assert {task["id"] for task in stored} == {line["id"] for line in lines}
+
+
+def test_reports_mid_stream_errors_in_band(make_client):
+    main, client = make_client()
+    client.post("/createUser", params={"user_id": "alice"})
+
+    def failing_completion(prompt):
+        async def chunks():
+            async for chunk in canned_chunks(json.dumps({"tasks": TASKS[:2]})[:-2] + ","):
+                yield chunk
+            raise RuntimeError("model went away")
+        return chunks()
+
+    lines = stream(client, main, failing_completion)
+    assert [line.get("title") for line in lines[:-1]] == ["step 0", "step 1"]
+    assert lines[-1] == {"error": "model went away"}
+    # Tasks parsed before the failure are still saved
+    assert len(client.get("/getTasks", params={"user_id": "alice"}).json()) == 2
+
+
+def test_unknown_user_fails_before_streaming(make_client):
+    main, client = make_client()
+    main.app.dependency_overrides[main.get_completion_stream] = lambda: canned_completion("{}")
+    response = client.post("/generateTasksStream", json={"prompt": "x", "user_id": "nobody"})
+    assert response.status_code == 404
+
+
+def test_flushes_pending_tasks_while_the_model_pauses(make_client, monkeypatch):
+    import asyncio
+    import time
+
+    main, client = make_client()
+    monkeypatch.setattr(main, "STREAM_BATCH_DELAY", 0.1)
+    client.post("/createUser", params={"user_id": "alice"})
+
+    flushed_at = []
+    create_tasks = main.db.create_tasks
+
+    async def recording_create_tasks(user_id, tasks):
+        flushed_at.append(time.monotonic())
+        return await create_tasks(user_id, tasks)
+
+    main.db.create_tasks = recording_create_tasks
+    text = json.dumps({"tasks": TASKS[:2]})
+    split = text.index("}") + 1
+    resumed_at = []
+
+    def pausing_completion(prompt):
+        async def chunks():
+            yield text[:split]
+            await asyncio.sleep(0.5)
+            resumed_at.append(time.monotonic())
+            yield text[split:]
+        return chunks()
+
+    lines = stream(client, main, pausing_completion)
+    assert [line["title"] for line in lines] == ["step 0", "step 1"]
+    # The first task was saved during the pause, not when the next chunk came
+    assert len(flushed_at) == 2
+    assert flushed_at[0] < resumed_at[0]
@@ -0,0 +1,136 @@
+import asyncio
+import uuid
+
+import pytest
+
+from database_service import DatabaseService
+
+
+@pytest.mark.parametrize("group_commit", ["0", "1"])
+def test_task_endpoints(make_client, group_commit):
+    _, client = make_client(GROUP_COMMIT=group_commit)
+    assert client.post("/createUser", params={"user_id": "alice"}).status_code == 200
+
+    response = client.post("/createTask", params={"user_id": "alice"}, json={"title": "write tests"})
+    assert response.status_code == 200, response.text
+    task = response.json()
+    assert task["title"] == "write tests"
+    assert task["completed"] is False
+
+    response = client.post("/updateTask", params={"task_id": task["id"], "user_id": "alice"},
+                           json={"completed": True})
+    assert response.status_code == 200, response.text
+    assert response.json()["completed"] is True
+
+    response = client.post("/bulkCreateTasks", json={
+        "user_id": "alice",
+        "tasks": [{"title": f"bulk {i}"} for i in range(3)],
+    })
+    assert response.status_code == 200, response.text
+    assert [t["title"] for t in response.json()] == ["bulk 0", "bulk 1", "bulk 2"]
+
+    response = client.post("/createTask", params={"user_id": "nobody"}, json={"title": "x"})
+    assert response.status_code == 400
+
+    titles = {t["title"] for t in client.get("/getTasks", params={"user_id": "alice"}).json()}
+    assert titles == {"write tests", "bulk 0", "bulk 1", "bulk 2"}
+
+
+def test_batch_resolves_each_caller_separately(tmp_path):
+    async def scenario():
+        db = DatabaseService(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}", group_commit=True,
+                             group_commit_delay=0.05)
+        await db.create_database_tables()
+        await db.create_user("alice")
+
+        ids = [str(uuid.uuid4()) for _ in range(10)]
+        calls = [db.create_task(user_id="alice", task_id=task_id, title=f"t{i}", difficulty=1)
+                 for i, task_id in enumerate(ids)]
+        calls.append(db.create_task(user_id="nobody", task_id=str(uuid.uuid4()), title="x", difficulty=1))
+        results = await asyncio.gather(*calls, return_exceptions=True)
+
+        assert [task.id for task in results[:10]] == ids
+        assert isinstance(results[10], ValueError)
+        assert len(await db.get_user_tasks("alice")) == 10
+        await db.close()
+
+    asyncio.run(scenario())
+
+
+def test_group_commit_leaves_other_writers_unaffected(tmp_path):
+    async def scenario():
+        db = DatabaseService(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}", group_commit=True)
+        await db.create_database_tables()
+        users = [f"user{n}" for n in range(20)]
+        for user_id in users:
+            await db.create_user(user_id)
+
+        async def churn(user_id):
+            for i in range(5):
+                task = await db.create_task(user_id=user_id, task_id=str(uuid.uuid4()),
+                                            title=f"t{i}", difficulty=1)
+                await db.share_task(users[(users.index(user_id) + 1) % len(users)], task.id)
+                await db.delete_task(task.id, user_id)
+
+        # Any "database is locked" error propagates out of gather
+        await asyncio.gather(*(churn(user_id) for user_id in users))
+        await db.close()
+
+    asyncio.run(scenario())
+
+
+def test_group_commit_still_sheds_when_backlogged(make_client):
+    from concurrent.futures import ThreadPoolExecutor
+
+    _, client = make_client(GROUP_COMMIT="1", WRITE_CONCURRENCY="1", WRITE_QUEUE_LIMIT="2")
+    users = [f"user{n}" for n in range(50)]
+    for user_id in users:
+        client.post("/createUser", params={"user_id": user_id})
+
+    def create(user_id):
+        return client.post("/createTask", params={"user_id": user_id}, json={"title": "t"})
+
+    with ThreadPoolExecutor(max_workers=50) as pool:
+        responses = list(pool.map(create, users))
+    statuses = [response.status_code for response in responses]
+    assert statuses.count(429) > 0
+    assert statuses.count(200) >= 2
+    assert all(r.headers["Retry-After"] == "1" for r in responses if r.status_code == 429)
+
+
+def test_write_backlog_counts_unresolved_writes(tmp_path):
+    async def scenario():
+        db = DatabaseService(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}", group_commit=True,
+                             group_commit_delay=0.05)
+        await db.create_database_tables()
+        await db.create_user("alice")
+        calls = [asyncio.create_task(db.create_task(user_id="alice", task_id=str(uuid.uuid4()),
+                                                    title="t", difficulty=1))
+                 for _ in range(5)]
+        await asyncio.sleep(0)
+        assert db.write_backlog() == 5
+        await asyncio.gather(*calls)
+        assert db.write_backlog() == 0
+        await db.close()
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.parametrize("group_commit", ["0", "1"])
+def test_bulk_create_uses_one_transaction(make_client, group_commit):
+    main, client = make_client(GROUP_COMMIT=group_commit, RATE_LIMIT_BURST="1000")
+    client.post("/createUser", params={"user_id": "alice"})
+    calls = []
+    create_tasks = main.db.create_tasks
+
+    async def recording_create_tasks(user_id, tasks):
+        calls.append(len(tasks))
+        return await create_tasks(user_id, tasks)
+
+    main.db.create_tasks = recording_create_tasks
+    response = client.post("/bulkCreateTasks", json={
+        "user_id": "alice", "tasks": [{"title": str(i)} for i in range(200)]
+    })
+    assert response.status_code == 200, response.text
+    assert len(response.json()) == 200
+    assert calls == [200]
@@ -0,0 +1,123 @@
+import asyncio
+
+import pytest
+
+import rate_limiter
+from rate_limiter import RateLimiter, RateLimitExceeded, RequestTooLarge, TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limiter.time, "monotonic", clock)
+    return clock
+
+
+def test_bucket_refills_at_rate(clock):
+    bucket = TokenBucket(rate=2.0, capacity=4.0)
+    assert bucket.take(4) == 0.0
+    assert bucket.take(1) == pytest.approx(0.5)
+    clock.now += 1.0
+    assert bucket.take(2) == 0.0
+    # Refill never exceeds capacity
+    clock.now += 100.0
+    bucket.refill(clock.now)
+    assert bucket.tokens == 4.0
+
+
+def test_check_raises_with_retry_after(clock):
+    limiter = RateLimiter(rate=1.0, burst=3.0)
+    for _ in range(3):
+        limiter.check("createTask", "alice")
+    with pytest.raises(RateLimitExceeded) as exc:
+        limiter.check("createTask", "alice")
+    assert exc.value.retry_after == 1
+
+    # Buckets are per user
+    limiter.check("createTask", "bob")
+
+    clock.now += 1.0
+    limiter.check("createTask", "alice")
+
+
+def test_retry_after_rounds_up_to_whole_seconds(clock):
+    limiter = RateLimiter(rate=2.0, burst=10.0, costs={"generateTasks": 10})
+    limiter.check("generateTasks", "alice")
+    clock.now += 1.2
+    with pytest.raises(RateLimitExceeded) as exc:
+        limiter.check("generateTasks", "alice")
+    # 7.6 tokens short at 2/s -> 3.8s
+    assert exc.value.retry_after == 4
+
+
+def test_oversize_cost_is_rejected_outright(clock):
+    limiter = RateLimiter(rate=5.0, burst=30.0)
+    # A full bucket covers a 30-task batch but never a 31-task one
+    limiter.check("bulkCreateTasks", "alice", units=30)
+    with pytest.raises(RequestTooLarge) as exc:
+        limiter.check("bulkCreateTasks", "bob", units=31)
+    assert "limit per request is 30" in exc.value.detail
+    # Nothing was charged for the rejected call
+    limiter.check("bulkCreateTasks", "bob", units=30)
+
+
+def test_evicts_least_recently_used_bucket(clock):
+    limiter = RateLimiter(rate=1.0, burst=2.0, max_buckets=2)
+    limiter.check("getTasks", "a")
+    limiter.check("getTasks", "b")
+    limiter.check("getTasks", "a")
+    limiter.check("getTasks", "c")
+    assert list(limiter.buckets) == ["a", "c"]
+
+
+def test_write_slot_sheds_once_queue_is_full():
+    async def scenario():
+        limiter = RateLimiter(write_concurrency=1, max_queued_writes=2)
+        release = asyncio.Event()
+
+        async def writer():
+            async with limiter.write_slot():
+                await release.wait()
+
+        holder = asyncio.create_task(writer())
+        await asyncio.sleep(0)
+        waiters = [asyncio.create_task(writer()) for _ in range(2)]
+        await asyncio.sleep(0)
+        assert limiter.queued_writes == 2
+
+        with pytest.raises(RateLimitExceeded) as exc:
+            async with limiter.write_slot():
+                pass
+        assert exc.value.retry_after == 1
+
+        release.set()
+        await asyncio.gather(holder, *waiters)
+        assert limiter.queued_writes == 0
+        # With the queue drained, writes are admitted again
+        async with limiter.write_slot():
+            pass
+
+    asyncio.run(scenario())
+
+
+def test_http_rejections(make_client):
+    _, client = make_client(RATE_LIMIT_PER_SEC="0.5", RATE_LIMIT_BURST="2")
+    for _ in range(2):
+        assert client.get("/getTasks", params={"user_id": "alice"}).status_code == 200
+    response = client.get("/getTasks", params={"user_id": "alice"})
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "2"
+
+    response = client.post("/bulkCreateTasks", json={
+        "user_id": "bob", "tasks": [{"title": str(i)} for i in range(3)]
+    })
+    assert response.status_code == 413
+    assert "Retry-After" not in response.headers